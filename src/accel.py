@@ -0,0 +1,22 @@
+"""
+Optional acceleration helpers.
+
+Numba JIT-compiles the small numeric kernels that run every frame
+(uncertainty scoring), removing interpreter overhead.
+A kernel is only kept where it measures faster than the plain Python it replaces.
+
+Numba is OPTIONAL: If it isn't installed, `njit` is a no-op decorator and
+the kernels simply run as plain Python (same results, just slower).
+"""
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Fallback: Return the function unchanged (supports @njit and @njit(...))."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
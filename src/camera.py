@@ -10,9 +10,17 @@ Core Responsibilities:
 """
 
 import cv2
+import sys
 import time
+import threading
 from typing import Tuple, Optional
 
+# Non-blocking key polling (missing on OpenCV < 4.5)
+_POLL_KEY = getattr(cv2, "pollKey", None)
+
+# Quit key, computed once instead of ord('q') every loop iteration
+Q_KEY = ord('q')
+
 
 class Camera:
     """
@@ -24,38 +32,166 @@ class Camera:
     - Extensibility: Easy to swap out 'read' logic later (e.g., for different hardware).
     """
     
-    def __init__(self, camera_id: int = 0):
+    def __init__(self, camera_id: int = 0, low_latency: bool = True):
         """
         Initialize camera hardware connection.
         
         Args:
             camera_id: Device index (0 is usually default USB/Integrated cam).
+            low_latency: Ask the driver to buffer only 1 frame, so read()
+                         returns the freshest image instead of a stale one.
             
         Raises:
             RuntimeError: If hardware cannot be accessed (Fail Fast).
         """
         # Connect to hardware
-        # On Windows, cv2.CAP_DSHOW makes startup much faster (DirectShow)
-        self.cap = cv2.VideoCapture(camera_id, cv2.CAP_DSHOW)
+        # Pick the backend explicitly, letting OpenCV probe is slow and noisy:
+        # - Windows: cv2.CAP_DSHOW makes startup much faster (DirectShow)
+        # - Linux: cv2.CAP_V4L2 skips GStreamer probing (and its warnings)
+        if sys.platform.startswith("win"):
+            backend = cv2.CAP_DSHOW
+        elif sys.platform.startswith("linux"):
+            backend = cv2.CAP_V4L2
+        else:
+            backend = cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(camera_id, backend)
         
         # Critical Check: Validate hardware connection immediately.
         # Don't wait until runtime read() calls to fail.
         if not self.cap.isOpened():
             raise RuntimeError(f"Failed to open camera {camera_id}")
         
+        # Low Latency: By default the driver queues several frames, so read()
+        # returns images from the past. Closed-loop control needs the CURRENT
+        # image to see the effect of its own actions. Not all backends honor it.
+        self.low_latency = low_latency
+        if low_latency:
+            try:
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            except cv2.error:
+                pass
+        
         # Store ID for reference/logging
         self.camera_id = camera_id
+        
+        # Async Capture State (see start_async)
+        # _cap_lock: VideoCapture is not thread-safe, serialize all access.
+        # _frame_lock: Protects the latest frame + sequence number.
+        self._cap_lock = threading.Lock()
+        self._frame_lock = threading.Lock()
+        self._new_frame = threading.Event()
+        self._thread = None
+        self._stop = False
+        self._latest_ok = False
+        self._latest_frame = None
+        self._latest_seq = 0
+        self._consumed_seq = 0
+    
+    def start_async(self) -> None:
+        """
+        Start a background thread that keeps grabbing frames.
+        
+        Why?
+        - If the main loop is slower than the camera, the driver queue fills up
+          and latency grows. The reader thread drains it continuously,
+          so read() always gets the newest frame (at most 1 frame old).
+        """
+        if self._thread is not None:
+            return
+        
+        self._stop = False
+        self._thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self._thread.start()
+    
+    def _reader_loop(self) -> None:
+        """Background worker: grab + decode continuously, keep only the latest."""
+        while not self._stop:
+            with self._cap_lock:
+                ret = self.cap.grab()
+                if ret:
+                    ret, frame = self.cap.retrieve()
+                else:
+                    frame = None
+            
+            with self._frame_lock:
+                self._latest_ok = ret
+                self._latest_frame = frame
+                self._latest_seq += 1
+                # Set under the lock (read() clears it under the lock too):
+                # event set <=> unconsumed frame. Setting it after releasing
+                # could re-set it for a frame read() already took -> busy spin.
+                self._new_frame.set()
+            
+            if not ret:
+                # Camera disconnected: stop and let read() report the failure
+                break
     
     def read(self) -> Tuple[bool, Optional[cv2.Mat]]:
         """
         Read a single frame (The 'Sensing' part).
         
+        In async mode, blocks until the reader thread delivers a frame
+        we have not returned yet (never returns the same frame twice).
+        A slow frame (long exposure, driver restarting its stream after
+        set()) just means a longer wait, like a blocking cap.read().
+        
         Returns:
             (success, frame): 
                 - success: False if frame is dropped/camera disconnected.
                 - frame: The visual data (numpy array) or None.
         """
-        return self.cap.read()
+        if self._thread is None:
+            # Sync mode still shares the capture with set_property(), which
+            # ActionPolicy calls from its control thread -> same lock.
+            with self._cap_lock:
+                return self.cap.read()
+        
+        while True:
+            with self._frame_lock:
+                if self._latest_seq > self._consumed_seq:
+                    self._consumed_seq = self._latest_seq
+                    self._new_frame.clear()
+                    # No copy needed: retrieve() allocates a fresh array
+                    # every time, the reader never writes into old frames.
+                    return self._latest_ok, self._latest_frame
+            
+            # A failed grab/retrieve is published as a frame (ok=False) before
+            # the reader exits. Only a reader that died without one (e.g. an
+            # exception) needs this check, waiting in slices to notice it.
+            if not self._new_frame.wait(timeout=0.5) and not self._thread.is_alive():
+                return False, None
+    
+    def read_latest(self, threshold_ms: float = 5.0,
+                    max_drain: int = 10) -> Tuple[bool, Optional[cv2.Mat]]:
+        """
+        Read the freshest frame, skipping anything queued in the driver.
+        
+        Trick: A grab() of an already-buffered frame returns almost instantly,
+        a grab() that has to wait for the sensor takes ~1 frame period.
+        So we keep grabbing until one grab is "slow" -> that frame is live.
+        
+        Args:
+            threshold_ms: Grab time above which a frame counts as fresh.
+            max_drain: Upper bound on grabs (some drivers never block).
+        """
+        # Async mode already serves the latest frame
+        if self._thread is not None:
+            return self.read()
+        
+        # Lock per call, not around the whole drain: a pending set_property()
+        # gets in between. Timing starts inside the lock, so waiting for it
+        # doesn't make a buffered frame look fresh.
+        for _ in range(max_drain):
+            with self._cap_lock:
+                t0 = time.perf_counter()
+                if not self.cap.grab():
+                    return False, None
+                grab_ms = (time.perf_counter() - t0) * 1000.0
+            if grab_ms > threshold_ms:
+                break
+        
+        with self._cap_lock:
+            return self.cap.retrieve()
     
     def display(self, frame, window_name: str = "Camera") -> None:
         """
@@ -78,11 +214,13 @@ class Camera:
         Returns:
             True if the driver accepted the command.
         """
-        return self.cap.set(prop, value)
+        with self._cap_lock:
+            return self.cap.set(prop, value)
     
     def get_property(self, prop: int) -> float:
         """Read current camera settings."""
-        return self.cap.get(prop)
+        with self._cap_lock:
+            return self.cap.get(prop)
     
     def is_opened(self) -> bool:
         """Check connection status."""
@@ -93,10 +231,71 @@ class Camera:
         Graceful cleanup.
         Release hardware lock so other apps can use the camera.
         """
-        self.cap.release()
+        # Stop the reader thread first, it must not touch a released capture
+        if self._thread is not None:
+            self._stop = True
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        
+        # The join may have timed out with the reader still inside grab()
+        with self._cap_lock:
+            self.cap.release()
         cv2.destroyAllWindows()
 
 
+def poll_key(frame_idx: int, every: int = 3) -> int:
+    """
+    Cheap keyboard check for display loops.
+    
+    cv2.waitKey(1) can cost ~15 ms on Windows regardless of its argument,
+    which caps the loop at ~60 FPS. cv2.pollKey() (OpenCV 4.5+) is
+    non-blocking, so we use it every frame. On older OpenCV we fall back
+    to waitKey, but only every 'every'-th frame.
+    
+    Returns:
+        Key code (masked to 8 bits), or -1 if no key was checked/pressed.
+    """
+    if _POLL_KEY is not None:
+        key = _POLL_KEY()
+    elif frame_idx % every == 0:
+        key = cv2.waitKey(1)
+    else:
+        return -1
+    # Mask only real keys: -1 & 0xFF would turn "nothing pressed" into 255
+    return key & 0xFF if key != -1 else -1
+
+
+def _measure_fps(camera: Camera, seconds: float = 2.0) -> Tuple[Optional[float], bool]:
+    """
+    Measure camera FPS over the first few seconds (frames are still shown).
+    Kept out of main's capture loop so the steady state has no timing overhead.
+    
+    Returns:
+        (fps, quit):
+            - fps: Measured FPS, or None if stopped early.
+            - quit: True if the user pressed 'q' or closed the window.
+                    (fps None + quit False = a frame could not be read)
+    """
+    start_time = time.time()
+    frame_count = 0
+    
+    while True:
+        ret, frame = camera.read()
+        if not ret:
+            return None, False
+        
+        camera.display(frame)
+        if poll_key(frame_count) == Q_KEY:
+            return None, True
+        if cv2.getWindowProperty("Camera", cv2.WND_PROP_VISIBLE) < 1:
+            return None, True
+        
+        frame_count += 1
+        elapsed = time.time() - start_time
+        if elapsed >= seconds:
+            return frame_count / elapsed, False
+
+
 def main():
     """
     Independent Test Entry Point.
@@ -117,13 +316,21 @@ def main():
     
     print("Camera opened. Press 'q' IN THE VIDEO WINDOW to quit.")
     
-    # FPS Measurement (First 2 seconds only)
-    start_time = time.time()
-    frame_count = 0
-    fps_measured = False
-    
     try:
+        # FPS Measurement (First 2 seconds only)
+        fps, quit_requested = _measure_fps(camera, seconds=2.0)
+        if quit_requested:
+            print("Quitting...")
+            return
+        if fps is None:
+            print("Failed to read frame")
+            return
+        print(f"Measured Camera FPS: {fps:.2f}")
+        
+        loop_idx = 0
         while True:
+            loop_idx += 1
+            
             # 1. Sense
             ret, frame = camera.read()
             
@@ -133,21 +340,11 @@ def main():
             
             # 2. Visualize
             camera.display(frame)
-            
-            # --- Measure FPS (One-time in first 2s) ---
-            if not fps_measured:
-                frame_count += 1
-                elapsed = time.time() - start_time
-                if elapsed >= 2.0:
-                    fps = frame_count / elapsed
-                    print(f"Measured Camera FPS: {fps:.2f}")
-                    fps_measured = True
-            # ------------------------------
 
             # Check for 'q' key press
             # IMPORTANT: Focus must be on the video window, not the terminal!
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
+            key = poll_key(loop_idx)
+            if key == Q_KEY:
                 print("Quitting...")
                 break
             
@@ -9,6 +9,12 @@ import cv2
 import numpy as np
 from typing import Tuple, Optional, Any
 
+# OpenCL (T-API): With cv2.UMat inputs, OpenCV runs supported kernels
+# (color conversion) on the GPU/iGPU instead of the CPU.
+# Note: ArUco detection itself always runs on the CPU (detectMarkers
+# downloads a UMat input first), so this only pays off on large frames.
+_HAVE_OPENCL = cv2.ocl.haveOpenCL()
+
 class PerceptionSystem:
     """
     Wrapper for ArUco marker detection.
@@ -18,14 +24,29 @@ class PerceptionSystem:
     - To keep detection parameters configurable.
     """
     
-    def __init__(self, marker_dict_id=cv2.aruco.DICT_6X6_250):
+    def __init__(self, marker_dict_id=cv2.aruco.DICT_6X6_250, use_green_proxy: bool = True,
+                 use_opencl: bool = False):
         """
         Initialize perception resources.
         
         Args:
             marker_dict_id: Which ArUco dictionary to use. 
                           DICT_6X6_250 is a common standard (6x6 bits, 250 IDs).
+            use_green_proxy: Use the green channel as "gray" (3x less memory traffic).
+                          Set False under strongly colored lighting.
+            use_opencl: Offload the gray conversion via cv2.UMat when OpenCL
+                          is available (falls back to numpy otherwise).
+                          Off by default: the frame upload + gray download
+                          usually cost more than the conversion saves.
         """
+        self.use_green_proxy = use_green_proxy
+        self.use_opencl = use_opencl and _HAVE_OPENCL
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        
+        # Grayscale buffer, allocated on first frame and reused (no per-frame malloc)
+        self._gray = None
+        
         # Load the dictionary (the "vocabulary" of markers we can recognize)
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(marker_dict_id)
         
@@ -35,9 +56,9 @@ class PerceptionSystem:
         # Create the detector object (OpenCV 4.7+ style)
         self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.aruco_params)
         
-        print(f"Perception initialized with dict ID: {marker_dict_id}")
+        print(f"Perception initialized with dict ID: {marker_dict_id} (OpenCL: {self.use_opencl})")
 
-    def detect(self, frame: np.ndarray) -> Tuple[bool, Optional[np.ndarray], Any]:
+    def detect(self, frame: np.ndarray) -> Tuple[bool, Optional[np.ndarray], Any, float]:
         """
         Detect ArUco markers in a frame.
         
@@ -45,59 +66,88 @@ class PerceptionSystem:
             frame: Input image (BGR) from camera.
             
         Returns:
-            (detected, ids, corners):
+            (detected, ids, corners, brightness):
                 - detected (bool): True if ANY marker is found.
                 - ids (np.ndarray or None): List of ALL found IDs.
                 - corners (list): List of corners for visualization.
+                - brightness (float): Mean of the gray image (free by-product,
+                  saves the caller another pass over the frame).
         """
         if frame is None:
-            return False, None, None
+            return False, None, None, 0.0
 
         # Convert to grayscale (detection works better/faster on gray images)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Green carries most of the luma (0.587), so for black/white markers
+        # it's an equivalent and much cheaper proxy than the weighted sum.
+        if self.use_opencl:
+            # Upload once, the conversion runs on the device
+            src = cv2.UMat(frame)
+            if self.use_green_proxy:
+                gray = cv2.extractChannel(src, 1)
+            else:
+                gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        else:
+            if self._gray is None or self._gray.shape != frame.shape[:2]:
+                self._gray = np.empty(frame.shape[:2], np.uint8)
+            
+            if self.use_green_proxy:
+                gray = cv2.extractChannel(frame, 1, self._gray)
+            else:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, self._gray)
         
         # Core detection step
         corners, ids, rejected = self.detector.detectMarkers(gray)
         
+        if self.use_opencl:
+            # Results come back as UMat too. They are tiny, so download them
+            # (the image itself stays on the device).
+            ids = ids.get() if ids is not None else None
+            corners = tuple(c.get() for c in corners)
+        
+        # Piggyback the exposure metric on the gray buffer we already have
+        brightness = float(cv2.mean(gray)[0])
+        
         if ids is not None and len(ids) > 0:
-            return True, ids, corners
+            return True, ids, corners, brightness
         else:
-            return False, None, None
+            return False, None, None, brightness
 
-    def visualize(self, frame: np.ndarray, corners: Any, ids: Optional[np.ndarray]) -> np.ndarray:
+    def visualize(self, frame: np.ndarray, corners: Any, ids: Optional[np.ndarray],
+                  inplace: bool = False) -> np.ndarray:
         """
         Draw bounding boxes and IDs on the frame.
+        
+        Args:
+            inplace: Draw directly on 'frame' (saves a full-frame copy).
+                     Only use it if the caller doesn't need the original.
         """
         if corners is None or ids is None:
             return frame
             
         # Create a copy so we don't modify the original frame
-        annotated_frame = frame.copy()
+        annotated_frame = frame if inplace else frame.copy()
         
         # 1. Draw Total Count at Top-Left
         total_count = len(ids)
         cv2.putText(annotated_frame, f"Total Markers: {total_count}", (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
         
-        # 2. Draw each marker
-        for i, corner_set in enumerate(corners):
-            # Get the ID for this specific marker
-            this_id = ids[i][0]
-            
-            # Convert to integer points
-            points = corner_set[0].astype(np.int32)
-            
-            # Draw the box (Green, thickness=4)
-            cv2.polylines(annotated_frame, [points], isClosed=True, color=(0, 255, 0), thickness=4)
-            
+        # 2. Convert ALL corners to integer points at once -> (N, 4, 2)
+        points = np.stack([corner_set[0] for corner_set in corners]).astype(np.int32)
+        
+        # Draw all boxes in one call (Green, thickness=4)
+        cv2.polylines(annotated_frame, list(points), isClosed=True, color=(0, 255, 0), thickness=4)
+        
+        # ID text goes above the box (Top-Left corner, moved up slightly)
+        first_corners = points[:, 0]
+        text_positions = first_corners - (0, 10)
+        
+        # 3. Per-marker details (no batch API for circles/text)
+        for i in range(total_count):
             # Draw the corner point (Red dot)
-            cv2.circle(annotated_frame, tuple(points[0]), 5, (0, 0, 255), -1)
-            
-            # Draw ID above the box (Top-Left corner)
-            text_pos = tuple(points[0])
-            text_pos = (text_pos[0], text_pos[1] - 10) # Move up slightly
+            cv2.circle(annotated_frame, tuple(first_corners[i].tolist()), 5, (0, 0, 255), -1)
             
-            cv2.putText(annotated_frame, f"ID:{this_id}", text_pos, 
+            cv2.putText(annotated_frame, f"ID:{ids[i][0]}", tuple(text_positions[i].tolist()), 
                        cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.6, color=(0, 255, 0), thickness=2)
 
         return annotated_frame
@@ -108,7 +158,7 @@ def main():
     """
     Test perception module using the camera.
     """
-    from src.camera import Camera
+    from src.camera import Camera, Q_KEY, poll_key
     
     print("Initializing Camera & Perception...")
     try:
@@ -119,6 +169,7 @@ def main():
         print("System Ready. Show an ArUco marker to the camera!")
         print("Press 'q' in the window to quit.")
         
+        i = 0
         while True:
             # 2. Loop: Sense -> Perceive -> Visualize
             ret, frame = camera.read()
@@ -126,7 +177,7 @@ def main():
                 break
                 
             # Run detection
-            detected, ids, corners = perception.detect(frame)
+            detected, ids, corners, _ = perception.detect(frame)
             
             # Visualize result
             # Pass the full list of IDs to visualize
@@ -143,8 +194,10 @@ def main():
                 
             camera.display(vis_frame, "Perception Test")
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # pollKey pumps GUI events every frame (window repaints) without blocking
+            if poll_key(i) == Q_KEY:
                 break
+            i += 1
                 
     except Exception as e:
         print(f"\nError: {e}")
@@ -8,7 +8,10 @@ Currently supports:
 
 import cv2
 import time
+import queue
+import threading
 from typing import List, Optional
+from src.queues import put_latest
 
 class ActionPolicy:
     """
@@ -27,6 +30,15 @@ class ActionPolicy:
         # -1 = 640ms, -2 = 320ms ... -5 = 40ms, -6 = 20ms, -7 = 10ms
         self.exposure_levels = [-8, -7, -6, -5, -4, -3,-2]
         
+        # Control Thread: Many drivers block 50-400ms inside set(),
+        # so exposure changes are applied in the background.
+        # Single-slot queue: only the LATEST request matters.
+        self._queue = queue.Queue(maxsize=1)
+        self._pending_lock = threading.Lock()
+        self._pending_val = None # Requested but not yet applied
+        self._worker_thread = threading.Thread(target=self._worker, daemon=True)
+        self._worker_thread.start()
+        
     def _check_exposure_support(self) -> bool:
         """
         Test if the camera supports exposure control.
@@ -70,12 +82,64 @@ class ActionPolicy:
         val = self.exposure_levels[idx]
         
         print(f"Action: Setting Exposure to {val}")
-        self.camera.set_property(cv2.CAP_PROP_EXPOSURE, val)
+        with self._pending_lock:
+            self._pending_val = val
+        
+        # Drop a stale request that wasn't applied yet, keep only the latest.
+        put_latest(self._queue, val)
+
+    def suggest_step(self, mean_intensity: float) -> int:
+        """
+        Suggest a single exposure step from image brightness (classic AE rule).
+        
+        Brightness responds multiplicatively to exposure, and our levels are
+        1 stop (x2) apart, so one step is the natural correction.
+        
+        Args:
+            mean_intensity: Mean gray value (0-255).
+            
+        Returns:
+            +1 (brighter) if too dark, -1 (darker) if too bright, else 0.
+        """
+        if mean_intensity < 80:
+            return 1
+        if mean_intensity > 220:
+            return -1
+        return 0
+
+    def is_settled(self) -> bool:
+        """
+        True once the driver has accepted the latest exposure request.
+        
+        Note: We don't compare against get_property() because some cameras
+        report approximate values (or other units) for exposure.
+        """
+        with self._pending_lock:
+            return self._pending_val is None
+
+    def close(self):
+        """Stop the control thread (call before releasing the camera)."""
+        put_latest(self._queue, None)
+        self._worker_thread.join(timeout=2.0)
+
+    def _worker(self):
+        """Background worker: apply exposure values from the queue."""
+        while True:
+            val = self._queue.get()
+            if val is None:
+                break
+            
+            self.camera.set_property(cv2.CAP_PROP_EXPOSURE, val)
+            
+            with self._pending_lock:
+                # Only settled if no newer request arrived meanwhile
+                if self._pending_val == val and self._queue.empty():
+                    self._pending_val = None
 
 
 # --- Independent Test ---
 def main():
-    from src.camera import Camera
+    from src.camera import Camera, Q_KEY, poll_key
     
     print("Initializing Camera for Policy Test...")
     # Use ID 1 (your external cam)
@@ -98,14 +162,16 @@ def main():
                 
                 # Show result for 1 second
                 start = time.time()
+                frame_idx = 0
                 while time.time() - start < 2.0:
                     ret, frame = camera.read()
                     if ret:
                         cv2.putText(frame, f"Exp: {level}", (10, 50), 
                                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
                         camera.display(frame, "Policy Test")
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                    if poll_key(frame_idx) == Q_KEY:
                         return
+                    frame_idx += 1
                         
         except KeyboardInterrupt:
             pass
@@ -115,6 +181,7 @@ def main():
         camera.read() # clear buffer
         cv2.waitKey(0)
 
+    policy.close()
     camera.release()
 
 if __name__ == "__main__":
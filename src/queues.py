@@ -0,0 +1,21 @@
+"""
+Queue helpers shared by the worker threads.
+
+Our threads hand over "latest value wins" data (exposure requests, rendered
+frames). A single-slot queue where a new item replaces the stale one keeps
+the consumer on the newest data without ever blocking the producer.
+"""
+
+import queue
+
+
+def put_latest(q: queue.Queue, item) -> None:
+    """
+    Single-slot queue put: drop the stale item (if any), keep the newest.
+    Only valid with ONE producer, otherwise the put could still find it full.
+    """
+    try:
+        q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(item) # We are the only producer -> can't be full now
@@ -13,9 +13,33 @@ It also includes Temporal Smoothing to prevent jittery decisions.
 """
 
 import cv2
+import queue
+import threading
 import numpy as np
-from collections import deque
 from typing import Tuple, List, Optional
+from src.accel import njit, HAVE_NUMBA
+from src.queues import put_latest
+
+# OpenCL (T-API): cv2.UMat runs the sharpness kernels on the GPU/iGPU.
+# Uploading has a fixed cost, so only big marker ROIs (close-ups) use it.
+_HAVE_OPENCL = cv2.ocl.haveOpenCL()
+_OPENCL_MIN_PIXELS = 256 * 256
+
+@njit(fastmath=True, cache=True)
+def _score_kernel(sharp, area, s_low, s_inv, a_low, a_inv, detected):
+    """
+    Per-frame scoring arithmetic (see UncertaintyEngine.compute for the logic).
+    Returns: (score, q_sharpness, q_size)
+    """
+    # Map value to 0.0-1.0 range based on thresholds (clamped)
+    q_sharpness = min(1.0, max(0.0, (sharp - s_low) * s_inv))
+    q_size = min(1.0, max(0.0, (area - a_low) * a_inv))
+    
+    if not detected:
+        return 0.9, q_sharpness, q_size
+    score = max(0.0, min(1.0, 0.9 - 0.4 * (q_sharpness + q_size)))
+    return score, q_sharpness, q_size
+
 
 class UncertaintyEngine:
     """
@@ -25,127 +49,447 @@ class UncertaintyEngine:
     """
     
     def __init__(self, 
-                 sharpness_low=20.0, sharpness_high=300.0,
-                 size_low=800.0, size_high=100000):
+                 sharpness_low=60.0, sharpness_high=1500.0,
+                 size_low=800.0, size_high=100000,
+                 sharpness_roi_size=96, debug=True, use_opencl=False,
+                 per_marker_sharpness=False):
         """
         Args:
-            sharpness_low/high: Thresholds for Laplacian variance.
+            sharpness_low/high: Thresholds for Laplacian variance
+                                (measured on the resized marker ROI!).
             size_low/high: Thresholds for marker pixel area.
+            sharpness_roi_size: Marker ROI is resized to this square before the
+                                Laplacian, so sharpness is marker-relative.
+                                Changing it requires re-tuning sharpness_low/high.
+            debug: Return the raw metrics dict from compute() (else None).
+            use_opencl: Offload sharpness of large ROIs to OpenCL when available.
+                        Off by default (like PerceptionSystem): the result is
+                        only 96x96, so upload + download usually cost more than
+                        they save, and the first use builds the OpenCL
+                        kernels synchronously (a stall with a marker in view).
+            per_marker_sharpness: With debug, also report the sharpness of EVERY
+                        marker (metrics["sharpness_per_marker"]). Costs a resize
+                        per marker each frame, so it is opt-in.
         """
+        self.sharpness_roi_size = sharpness_roi_size
+        self.use_opencl = use_opencl and _HAVE_OPENCL
+        
+        # Reusable CPU buffers for _compute_sharpness (no per-frame malloc).
+        # Resized ROI + Laplacian have a FIXED shape -> allocate right away.
+        # Gray ROI size varies -> grow-only buffer, we write into a view of it.
+        self._gray_buf = None
+        self._small_buf = np.empty((sharpness_roi_size, sharpness_roi_size), np.uint8)
+        self._lap_buf = np.empty((sharpness_roi_size, sharpness_roi_size), np.int16)
+        
+        # Mosaic buffers for sharpness_per_marker, grow-only with the marker count
+        self._mosaic_bufs = None
+        
+        # Gray conversion, specialized on the first frame: the camera format
+        # is fixed for the whole session, so don't re-check it every frame.
+        self._to_gray = None
+        self.debug = debug
+        self.per_marker_sharpness = per_marker_sharpness
         self.s_low = sharpness_low
         self.s_high = sharpness_high
         self.a_low = size_low
         self.a_high = size_high
+        
+        # Normalization ranges are constant -> precompute reciprocals
+        # (per-frame multiply instead of divide)
+        self._s_inv = 1.0 / (sharpness_high - sharpness_low)
+        self._a_inv = 1.0 / (size_high - size_low)
+        
+        # Metrics dict is allocated once and overwritten every frame
+        self._metrics_buf = {
+            "detected": False,
+            "sharpness_raw": 0.0,
+            "size_raw": 0.0,
+            "q_sharpness": 0.0,
+            "q_size": 0.0,
+            "sharpness_per_marker": np.zeros(0)
+        }
+        
+        # Compile the kernel now (same argument types as compute()),
+        # so the JIT stall doesn't land on the first detection in the loop.
+        if HAVE_NUMBA:
+            _score_kernel(0.0, 0.0, self.s_low, self._s_inv, self.a_low, self._a_inv, False)
 
-    def compute(self, frame: np.ndarray, corners: list) -> Tuple[float, dict]:
+    def compute(self, frame: np.ndarray, corners: list) -> Tuple[float, Optional[dict]]:
         """
         Compute uncertainty score.
         
         Returns:
             score (float): 0.0 ~ 1.0
             metrics (dict): Raw values for debugging (sharpness, area, etc.)
+                            None unless debug=True (saves a dict per frame).
+                            NOTE: The same dict is reused (overwritten) on every
+                            call. Copy it if you need to keep it across frames.
         """
         # 1. Compute Raw Metrics
-        sharpness_val = self._compute_sharpness(frame)
-        
+        # Sharpness only matters for a detected marker (otherwise the score
+        # is fixed), so skip the expensive Laplacian when nothing was found.
         detected = (corners is not None and len(corners) > 0)
+        sharpness_val = 0.0
         area_val = 0.0
         if detected:
+            # Only the marker region matters for perception quality
+            roi = self._marker_roi(frame, corners[0])
+            sharpness_val = self._compute_sharpness(roi)
             # Use the area of the first marker
             area_val = cv2.contourArea(corners[0])
 
         # 2. Normalize to Quality (0.0=Bad, 1.0=Good)
-        q_sharpness = self._normalize(sharpness_val, self.s_low, self.s_high)
-        q_size = self._normalize(area_val, self.a_low, self.a_high)
-
-        # 3. Compute Uncertainty Logic
-        if not detected:
-            # Case A: Nothing found -> High Uncertainty
-            # We don't say 1.0 immediately to allow 'flicker' recovery, 
-            # but usually it's high. Let's say 0.9.
-            score = 0.9
-        else:
-            # Case B: Found, but how good is it?
-            # Base uncertainty = 0.1 (nothing is perfect)
-            # Penalty for blur: up to 0.4
-            # Penalty for small size: up to 0.4
-            
-            penalty_blur = (1.0 - q_sharpness) * 0.4
-            penalty_size = (1.0 - q_size) * 0.4
-            
-            score = 0.1 + penalty_blur + penalty_size
-
+        # 3. Compute Uncertainty Logic (both inside _score_kernel)
+        # Case A: Nothing found -> High Uncertainty
+        #   We don't say 1.0 immediately to allow 'flicker' recovery, 
+        #   but usually it's high. Let's say 0.9.
+        # Case B: Found, but how good is it?
+        #   Base uncertainty = 0.1 (nothing is perfect)
+        #   Penalty for blur: up to 0.4 -> (1 - q_sharpness) * 0.4
+        #   Penalty for small size: up to 0.4 -> (1 - q_size) * 0.4
+        #   Folded: 0.1 + 0.4*(1-qs) + 0.4*(1-qz) = 0.9 - 0.4*(qs + qz)
         # Clamp result to [0.0, 1.0]
-        score = max(0.0, min(1.0, score))
-        
-        metrics = {
-            "detected": detected,
-            "sharpness_raw": sharpness_val,
-            "size_raw": area_val,
-            "q_sharpness": q_sharpness,
-            "q_size": q_size
-        }
+        score, q_sharpness, q_size = _score_kernel(
+            float(sharpness_val), float(area_val),
+            self.s_low, self._s_inv, self.a_low, self._a_inv, detected)
+        
+        if not self.debug:
+            return score, None
+        
+        metrics = self._metrics_buf
+        metrics["detected"] = detected
+        metrics["sharpness_raw"] = sharpness_val
+        metrics["size_raw"] = area_val
+        metrics["q_sharpness"] = q_sharpness
+        metrics["q_size"] = q_size
+        if self.per_marker_sharpness:
+            metrics["sharpness_per_marker"] = self.sharpness_per_marker(frame, corners)
         
         return score, metrics
 
+    def _marker_roi(self, frame: np.ndarray, corner_set: np.ndarray) -> np.ndarray:
+        """
+        Crop the axis-aligned box around a marker (+1/8 padding, like
+        crop-before-filter decoders do), clipped to the frame.
+        """
+        x, y, w, h = cv2.boundingRect(corner_set.astype(np.int32))
+        pad = max(w, h) // 8
+        
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1 = min(x + w + pad, frame.shape[1])
+        y1 = min(y + h + pad, frame.shape[0])
+        return frame[y0:y1, x0:x1]
+
+    def _green_channel(self, src, on_device: bool, h: int, w: int):
+        """
+        Color input -> gray.
+        Green channel only: sharpness doesn't care about exact luma weights,
+        and skipping the 3-channel weighted sum is much cheaper.
+        (extractChannel beats a frame[..., 1] view, which OpenCV would copy.)
+        """
+        if on_device:
+            return cv2.extractChannel(src, 1)
+        
+        buf = self._gray_buf
+        if buf is None or buf.shape[0] < h or buf.shape[1] < w:
+            shape = (h, w) if buf is None else (max(h, buf.shape[0]), max(w, buf.shape[1]))
+            self._gray_buf = np.empty(shape, np.uint8)
+        return cv2.extractChannel(src, 1, self._gray_buf[:h, :w])
+
+    def _passthrough(self, src, on_device: bool, h: int, w: int):
+        """Grayscale input (e.g. mono camera) -> use as is, no buffer needed."""
+        return src
+
+    def _resize_interp(self, h: int, w: int) -> int:
+        """Interpolation for resizing an ROI to the sharpness square."""
+        return cv2.INTER_AREA if max(h, w) > self.sharpness_roi_size else cv2.INTER_LINEAR
+
+    def sharpness_per_marker(self, frame: np.ndarray, corners: list) -> np.ndarray:
+        """
+        Sharpness of EVERY detected marker with a single Laplacian pass.
+        
+        How?
+        - Each marker ROI is resized into its own tile of one tall "mosaic".
+        - Tiles get a 1px mirrored border (the Laplacian's default border mode),
+          so tiles don't bleed into each other.
+        - One Laplacian over the mosaic + integral images of lap and lap^2
+          -> each tile's variance from 4 lookups (no per-marker passes).
+        
+        Returns:
+            Sharpness per marker (same order as corners). Same values as
+            _compute_sharpness on each marker ROI.
+        """
+        n = 0 if corners is None else len(corners)
+        if n == 0:
+            return np.zeros(0)
+        
+        size = self.sharpness_roi_size
+        t = size + 2 # Tile side incl. border
+        
+        # Reuse the buffers (views of the first n tiles, still contiguous)
+        bufs = self._mosaic_bufs
+        if bufs is None or bufs[0].shape[0] < n * t:
+            rows = n * t
+            bufs = self._mosaic_bufs = (np.empty((rows, t), np.uint8),
+                                        np.empty((rows, t), np.int16),
+                                        np.empty((rows + 1, t + 1), np.float64),
+                                        np.empty((rows + 1, t + 1), np.float64))
+        mosaic = bufs[0][:n * t]
+        
+        for k, corner_set in enumerate(corners):
+            tile = mosaic[k * t:(k + 1) * t]
+            roi = self._marker_roi(frame, corner_set)
+            if roi.size == 0:
+                tile[:] = 0 # Zero tile -> sharpness 0
+                continue
+            h, w = roi.shape[:2]
+            if self._to_gray is None:
+                self._to_gray = self._green_channel if roi.ndim == 3 else self._passthrough
+            gray = self._to_gray(roi, False, h, w)
+            
+            cv2.resize(gray, (size, size), tile[1:-1, 1:-1], interpolation=self._resize_interp(h, w))
+            
+            # Mirrored border (BORDER_REFLECT_101): pixel -1 = pixel 1
+            tile[1:-1, 0] = tile[1:-1, 2]
+            tile[1:-1, -1] = tile[1:-1, -3]
+            tile[0] = tile[2]
+            tile[-1] = tile[-3]
+        
+        lap = cv2.Laplacian(mosaic, cv2.CV_16S, bufs[1][:n * t])
+        s1, s2 = cv2.integral2(lap, bufs[2][:n * t + 1], bufs[3][:n * t + 1],
+                               sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        
+        # Tile interiors: rows [r0, r1), cols [1, 1 + size)
+        r0 = np.arange(n) * t + 1
+        r1 = r0 + size
+        c0, c1 = 1, 1 + size
+        sum1 = s1[r1, c1] - s1[r0, c1] - s1[r1, c0] + s1[r0, c0]
+        sum2 = s2[r1, c1] - s2[r0, c1] - s2[r1, c0] + s2[r0, c0]
+        
+        # Variance = E[x^2] - E[x]^2
+        npx = size * size
+        return sum2 / npx - (sum1 / npx) ** 2
+
     def _compute_sharpness(self, frame: np.ndarray) -> float:
         """
         Compute image sharpness using Laplacian Variance.
         Higher = Sharper.
         """
-        if frame is None:
+        if frame is None or frame.size == 0:
             return 0.0
+        h, w = frame.shape[:2]
+        
+        # Large ROI -> run the pipeline below on the device (same calls)
+        on_device = self.use_opencl and h * w >= _OPENCL_MIN_PIXELS
+        src = cv2.UMat(frame) if on_device else frame
+        
+        # Output buffers (None = let OpenCV allocate, e.g. on the device)
+        small_dst = lap_dst = None
+        if not on_device:
+            small_dst, lap_dst = self._small_buf, self._lap_buf
+        
         # Convert to gray if needed
-        if len(frame.shape) == 3:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = frame
+        if self._to_gray is None:
+            self._to_gray = self._green_channel if frame.ndim == 3 else self._passthrough
+        gray = self._to_gray(src, on_device, h, w)
+        
+        # Resize to a fixed square: Blur is then measured RELATIVE to the
+        # marker, so one threshold pair works for near and far markers.
+        # Also makes the Laplacian cost constant (and tiny).
+        # Shrinking: INTER_AREA (box filter, no aliasing). Growing: INTER_LINEAR
+        # (INTER_AREA would act like nearest-neighbor and invent sharp edges).
+        size = self.sharpness_roi_size
+        small = cv2.resize(gray, (size, size), small_dst, interpolation=self._resize_interp(h, w))
             
-        return cv2.Laplacian(gray, cv2.CV_64F).var()
-
-    def _normalize(self, value, low, high) -> float:
-        """Map value to 0.0-1.0 range based on thresholds."""
-        if value <= low:
-            return 0.0
-        if value >= high:
-            return 1.0
-        return (value - low) / (high - low)
+        # CV_16S instead of CV_64F: uint8 input -> Laplacian fits in int16 exactly
+        # (|4*255| < 32767), 4x less memory traffic and 4x wider SIMD lanes.
+        # Default ksize=1 keeps the original kernel, so thresholds don't change.
+        lap = cv2.Laplacian(small, cv2.CV_16S, lap_dst)
+        
+        # Variance = stddev^2. cv2.meanStdDev is a single SIMD pass without
+        # temporaries (numpy's var() makes two passes + a float64 copy).
+        _, stddev = cv2.meanStdDev(lap)
+        if isinstance(stddev, cv2.UMat):
+            stddev = stddev.get()
+        return float(stddev[0, 0]) ** 2
 
 
 class TemporalSmoother:
     """
     Smoothing wrapper to stabilize outputs over time.
+    
+    Uses a fixed ring buffer + running sum: O(1) per update,
+    no allocations, independent of window size.
+    (Plain Python list on purpose: indexing a numpy array per scalar
+    is slower than the whole deque version it replaces.)
     """
     def __init__(self, window_size=5):
-        self.history = deque(maxlen=window_size)
+        self.window_size = window_size
+        self._buf = [0.0] * window_size
+        self._sum = 0.0
+        self._i = 0 # Next slot to overwrite
+        self._n = 0 # Number of valid samples (<= window_size)
     
     def update(self, new_value: float) -> float:
         """Add new value and return moving average."""
-        self.history.append(new_value)
-        return sum(self.history) / len(self.history)
+        x = float(new_value)
+        buf, i = self._buf, self._i
+        self._sum += x - buf[i] # buf[i] is 0.0 while the buffer is still filling
+        buf[i] = x
+        
+        i += 1
+        if i == self.window_size:
+            i = 0
+            # Re-sync once per lap: add/subtract rounding errors would otherwise
+            # accumulate forever in a long-running loop (amortized O(1)).
+            self._sum = sum(buf)
+        self._i = i
+        if self._n < self.window_size:
+            self._n += 1
+        return self._sum / self._n
+
+    def update_batch(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized update(): Feed many values at once (e.g. replaying recorded
+        telemetry). Continues from the current history, like calling update()
+        for each value, but as a single cumsum pass instead of a Python loop.
+        
+        Returns:
+            Moving average after each value (same length as 'values').
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        w = self.window_size
+        
+        history = self.history()
+        combined = np.concatenate([history, values])
+        
+        # Moving average via cumsum differencing: sum(x[lo:j+1]) = c[j+1] - c[lo]
+        # Warm-up: the first windows are shorter (lo clipped at 0)
+        c = np.concatenate([[0.0], np.cumsum(combined)])
+        j = np.arange(len(combined))
+        lo = np.maximum(j - w + 1, 0)
+        means = (c[j + 1] - c[lo]) / (j + 1 - lo)
+        
+        # Keep the newest samples as the new state
+        last = combined[-w:]
+        m = len(last)
+        self._buf = last.tolist() + [0.0] * (w - m)
+        self._i = m % w
+        self._n = m
+        self._sum = sum(self._buf)
+        
+        return means[len(history):]
+
+    def history(self) -> np.ndarray:
+        """Samples in the window, in chronological order (oldest first)."""
+        if self._n < self.window_size:
+            return np.array(self._buf[:self._n])
+        return np.array(self._buf[self._i:] + self._buf[:self._i])
+
+    def mean(self) -> float:
+        """Moving average of the window (O(1), uses the running sum)."""
+        return self._sum / self._n if self._n else 0.0
+
+    def median(self) -> float:
+        """Median of the window (robust to single-frame outliers)."""
+        if not self._n:
+            return 0.0
+        # Order doesn't matter for the median -> no need to unroll the ring
+        return float(np.median(self._buf[:self._n]))
+
+    def ewma(self, alpha: float) -> float:
+        """
+        Exponentially weighted mean of the window (newest weighs most).
+        Weight of a sample 'k' frames old = (1 - alpha)^k, normalized.
+        """
+        if not self._n:
+            return 0.0
+        weights = (1.0 - alpha) ** np.arange(self._n - 1, -1, -1)
+        return float(np.dot(weights, self.history()) / weights.sum())
 
 
 # --- Independent Test ---
-def main():
-    from src.camera import Camera
-    from src.perception import PerceptionSystem
-    import time
+# HUD style (constant, no per-frame tuple/lookup work)
+_HUD_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_HUD_WHITE = (255, 255, 255)
+_HUD_GRAY = (200, 200, 200)
+_HUD_RED = (0, 0, 255)
+_HUD_GREEN = (0, 255, 0)
+
+# HUD panel region in frame coordinates (bar + the 3 text lines)
+_HUD_Y0, _HUD_Y1 = 55, 128
+_HUD_X1 = 224 + cv2.getTextSize("Uncertainty: 0.00", _HUD_FONT, 0.6, 2)[0][0]
+
+
+def _hud_key(smooth_score, metrics):
+    """
+    Quantize the HUD values, the panel is only re-rendered when this changes.
+    Score to 0.01 (= its display precision), sharpness/size to 2 significant digits.
+    Blurriest marker only with 2+ markers (None = line not shown).
+    """
+    per_marker = metrics["sharpness_per_marker"]
+    blurriest = float(f"{per_marker.min():.2g}") if len(per_marker) > 1 else None
+    return (round(smooth_score, 2),
+            float(f"{metrics['sharpness_raw']:.2g}"),
+            float(f"{metrics['size_raw']:.2g}"),
+            blurriest)
+
+
+def _render_hud_panel(key):
+    """
+    Rasterize the HUD once into an offscreen panel.
+    Returns: (panel, inv_alpha) - premultiplied BGR pixels (float32) + 1 - coverage.
+    Coverage, not a binary mask: putText antialiases on some OpenCV versions
+    (always on 5.x), a threshold would stamp the dark edge pixels too.
+    """
+    smooth_score, sharpness, size, blurriest = key
+    panel = np.zeros((_HUD_Y1 - _HUD_Y0, _HUD_X1, 3), np.uint8)
+    coverage = np.zeros(panel.shape[:2], np.uint8)
+    dy = _HUD_Y0
     
-    print("Initializing modules...")
-    camera = Camera(1)
-    perception = PerceptionSystem()
-    uncertainty_engine = UncertaintyEngine()
-    smoother = TemporalSmoother(window_size=5)
+    def draw(fn, *args, color, **kwargs):
+        # Same call on the panel (color on black = premultiplied) and the coverage map
+        fn(panel, *args, color=color, **kwargs)
+        fn(coverage, *args, color=255, **kwargs)
     
-    print("Running... (Press 'q' in window to quit)")
+    # Bar chart for uncertainty (Red=High, Green=Low)
+    bar_width = int(smooth_score * 200)
+    color = _HUD_RED if smooth_score > 0.5 else _HUD_GREEN
+    draw(cv2.rectangle, (10, 60 - dy), (10 + bar_width, 80 - dy), color=color, thickness=-1)
+    draw(cv2.putText, f"Uncertainty: {smooth_score:.2f}", (220, 75 - dy), 
+         _HUD_FONT, 0.6, color=_HUD_WHITE, thickness=2)
+    
+    # Debug info
+    sharp_text = f"Sharpness: {sharpness:.0f}"
+    if blurriest is not None:
+        sharp_text += f" (blurriest: {blurriest:.0f})"
+    draw(cv2.putText, sharp_text, (10, 100 - dy),
+         _HUD_FONT, 0.5, color=_HUD_GRAY, thickness=1)
+    draw(cv2.putText, f"Size: {size:.0f}", (10, 120 - dy),
+         _HUD_FONT, 0.5, color=_HUD_GRAY, thickness=1)
     
+    # Transparent background: out = frame * (1 - alpha) + premultiplied panel
+    inv_alpha = 1.0 - (coverage.astype(np.float32) / 255.0)[..., None]
+    return panel.astype(np.float32), inv_alpha
+
+
+def _perception_worker(camera, perception, uncertainty_engine, smoother, result_queue, stop_event):
+    """
+    Producer thread: Capture + perception + uncertainty, pipelined with drawing.
+    Puts (vis_frame, metrics, smooth_score) into result_queue, None = stopped.
+    
+    Why this way around?
+    HighGUI (imshow/waitKey/destroyAllWindows) is not thread-safe, and Cocoa
+    on macOS aborts if a window is created off the main thread. So the GUI
+    stays on the main thread and the compute work moves here instead.
+    """
     try:
-        while True:
+        while not stop_event.is_set():
             ret, frame = camera.read()
             if not ret: break
             
             # 1. Perception
-            detected, ids, corners = perception.detect(frame)
+            detected, ids, corners, _ = perception.detect(frame)
             
             # 2. Uncertainty
             raw_score, metrics = uncertainty_engine.compute(frame, corners)
@@ -153,29 +497,70 @@ def main():
             # 3. Smoothing
             smooth_score = smoother.update(raw_score)
             
-            # 4. Visualization
+            # 4. Visualization (markers only, the HUD is drawn by the main thread)
             vis_frame = perception.visualize(frame, corners, ids)
             
-            # Draw HUD
-            # Bar chart for uncertainty (Red=High, Green=Low)
-            bar_width = int(smooth_score * 200)
-            color = (0, 0, 255) if smooth_score > 0.5 else (0, 255, 0)
-            cv2.rectangle(vis_frame, (10, 60), (10 + bar_width, 80), color, -1)
-            cv2.putText(vis_frame, f"Uncertainty: {smooth_score:.2f}", (220, 75), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Debug info
-            cv2.putText(vis_frame, f"Sharpness: {metrics['sharpness_raw']:.0f}", (10, 100),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
-            cv2.putText(vis_frame, f"Size: {metrics['size_raw']:.0f}", (10, 120),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+            # metrics is reused by the engine -> hand over a copy
+            put_latest(result_queue, (vis_frame, dict(metrics), smooth_score))
+    finally:
+        put_latest(result_queue, None)
+
 
+def main():
+    from src.camera import Camera, Q_KEY, poll_key
+    from src.perception import PerceptionSystem
+    
+    print("Initializing modules...")
+    camera = Camera(1)
+    perception = PerceptionSystem()
+    uncertainty_engine = UncertaintyEngine(per_marker_sharpness=True)
+    smoother = TemporalSmoother(window_size=5)
+    
+    # Capture + compute run in a worker thread. Single-slot queue: if drawing
+    # falls behind, the stale frame is dropped instead of stalling perception.
+    result_queue = queue.Queue(maxsize=1)
+    stop_event = threading.Event()
+    worker = threading.Thread(target=_perception_worker,
+                              args=(camera, perception, uncertainty_engine, smoother,
+                                    result_queue, stop_event),
+                              daemon=True)
+    worker.start()
+    
+    # HUD Cache: Glyph rasterization dominates the drawing cost, so the HUD is
+    # a pre-rendered panel, just copied in while its (rounded) values hold.
+    cached_key = None
+    panel = inv_alpha = None
+    i = 0
+    
+    print("Running... (Press 'q' in window to quit)")
+    
+    try:
+        while True:
+            item = result_queue.get()
+            if item is None: break # Camera failed
+            vis_frame, metrics, smooth_score = item
+            
+            # Draw HUD (re-render only on change)
+            key = _hud_key(smooth_score, metrics)
+            if key != cached_key:
+                panel, inv_alpha = _render_hud_panel(key)
+                cached_key = key
+            
+            region = vis_frame[_HUD_Y0:_HUD_Y1, :_HUD_X1]
+            h, w = region.shape[:2] # Clip for frames narrower than the panel
+            region[:] = region * inv_alpha[:h, :w] + panel[:h, :w] + 0.5 # Round, uint8 truncates
+            
             camera.display(vis_frame, "Uncertainty Test")
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # pollKey pumps GUI events every frame (window repaints) without blocking
+            if poll_key(i) == Q_KEY:
                 break
+            i += 1
                 
     finally:
+        # Stop the worker before the camera is released
+        stop_event.set()
+        worker.join(timeout=2.0)
         camera.release()
         print("Done.")
 